@@ -0,0 +1,106 @@
+"""Shared helpers for talking to the AniList GraphQL API."""
+import time
+
+import requests
+
+ANILIST_URL = "https://graphql.anilist.co"
+
+# perPage 50 is the AniList maximum for media queries
+QUERY = """
+query ($startDate: FuzzyDateInt, $endDate: FuzzyDateInt, $page: Int) {
+  Page(page: $page, perPage: 50) {
+    media(type: ANIME, startDate_greater: $startDate, startDate_lesser: $endDate) {
+      idMal
+      title { romaji english native }
+      startDate { year month day }
+      season
+      seasonYear
+      averageScore
+      favourites
+      episodes
+      duration
+      format
+      genres
+      source
+      studios(isMain: true) { nodes { name } }
+      description(asHtml: false)
+      coverImage { large }
+      tags { name category }
+    }
+    pageInfo { hasNextPage }
+  }
+}
+"""
+
+
+def extract_row(m, year):
+    """Map one AniList media object to (anime row, genres, studios).
+
+    Returns None for entries that should be skipped.
+    """
+    genres_list = m.get("genres") or []
+    if "Hentai" in genres_list:
+        return None  # skip Hentai
+
+    title = m["title"].get("english") or m["title"].get("romaji") or m["title"].get("native")
+    studio_list = [s["name"] for s in m.get("studios", {}).get("nodes", [])]
+
+    # demographic guess
+    demo = None
+    for t in m.get("tags", []):
+        n = t.get("name", "").lower()
+        if n in ("shounen", "shoujo", "seinen", "josei"):
+            demo = t["name"]
+            break
+
+    row = (
+        m["idMal"], title, year, m.get("averageScore"), m.get("episodes"),
+        m.get("duration"), m.get("format"), ", ".join(genres_list), demo,
+        m.get("season"), m.get("source"), ", ".join(studio_list),
+        m.get("favourites"), m.get("description"),
+        m.get("coverImage", {}).get("large"),
+    )
+    return row, genres_list, studio_list
+
+
+def iter_year(year, session, rate_limiter=None):
+    """Yield one page of media objects at a time for a year, with retries."""
+    page = 1
+    wait_time = 1
+    start_date = year * 10000 + 101     # YYYY0101 -> Year jan 1
+    end_date = year * 10000 + 1231      # YYYY1231 -> Year dec 31
+
+    while True:
+        try:
+            if rate_limiter is not None:
+                rate_limiter.wait()
+            r = session.post(ANILIST_URL, json={"query": QUERY, "variables": {"startDate": start_date, "endDate": end_date, "page": page}})
+            r.raise_for_status()
+            resp_json = r.json()
+        except (requests.exceptions.RequestException, ValueError):
+            time.sleep(5)
+            continue
+
+        # Handle AniList errors or missing data
+        if "errors" in resp_json:
+            err = resp_json["errors"][0]
+            if err.get("status") == 429:
+                time.sleep(wait_time)
+                wait_time = min(wait_time * 2, 20)
+                continue
+            else:
+                print(f"[AniList ERROR] year={year} page={page}: {resp_json['errors']}")
+                return
+
+        wait_time = 1  # reset wait time on success
+        data = resp_json.get("data", {}).get("Page")
+        if not data:
+            print(f"[No data] year={year} page={page}")
+            return
+
+        yield data.get("media", [])
+
+        if not data.get("pageInfo", {}).get("hasNextPage"):
+            return
+
+        page += 1
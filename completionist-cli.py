@@ -1,4 +1,7 @@
-import xml.etree.ElementTree as ET 
+from lxml import etree as ET
+import functools
+import os
+import pickle
 import sqlite3
 from typing import List, Optional, Dict
 import typer  
@@ -10,30 +13,71 @@ from rich import box
 MAL_EXPORT_PATH = "data/animelist-1-12-25.xml"
 DB_PATH = "anime.db"
 
+# Common casings included up front so the hot loop skips the lower() call
+_COMPLETED = frozenset({"completed", "Completed", "COMPLETED", "2"})
+
+# Filter key -> (SQL condition, parameter transform)
+_FILTERS = {
+    'genre': ("mal_id IN (SELECT mal_id FROM anime_genre WHERE genre = ? COLLATE NOCASE)", lambda v: v),
+    'duration_min': ("duration_per_episode >= ?", lambda v: v),
+    'duration_max': ("duration_per_episode <= ?", lambda v: v),
+    'rating_min': ("rating >= ?", lambda v: v),
+    'demographic': ("demographic = ?", lambda v: v),
+    'source': ("source = ?", lambda v: v),
+    'studio': ("mal_id IN (SELECT mal_id FROM anime_studio WHERE studio LIKE ?)", lambda v: f"%{v}%"),
+}
+
+# Sort key -> ORDER BY fragment
+_ORDERS = {
+    'most_popular': "favourites DESC",
+    'least_popular': "favourites ASC",
+    'most_episodes': "cant_episodes DESC",
+    'least_episodes': "cant_episodes ASC",
+    'longest': "total_duration DESC",
+    'shortest': "total_duration ASC",
+}
+
 app = typer.Typer(add_completion=False)
 console = Console()
 
 def load_mal_watched(path: str) -> set:
     """Load watched anime from MAL export"""
     try:
-        tree = ET.parse(path)
-        root = tree.getroot()
+        # Cache the parsed set next to the XML so repeated CLI calls skip
+        # parsing entirely until the export changes
+        st = os.stat(path)
+        sig = (st.st_mtime_ns, st.st_size)
+        cache_path = path + ".cache"
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("sig") == sig:
+                return cached["ids"]
+        except (OSError, pickle.PickleError, EOFError):
+            pass
+
         watched = set()
 
-        for anime in root.findall("anime"):
+        # Stream the export instead of building the whole tree in memory,
+        # lxml filters the <anime> end events in C
+        for event, anime in ET.iterparse(path, events=("end",), tag="anime"):
             series_id = anime.find("series_animedb_id")
-            if series_id is None or series_id.text is None:
-                continue
-            mal_id = int(series_id.text)
-
-            status = anime.find("my_status")
-            if status is None or status.text is None:
-                status = ""
-            else: 
-                status = status.text.strip()
-
-            if status.lower() == "completed" or status == "2":
-                watched.add(mal_id)
+            if series_id is not None and series_id.text is not None:
+                status = anime.find("my_status")
+                if status is not None and status.text is not None:
+                    s = status.text.strip()
+                    if s in _COMPLETED or s.lower() == "completed":
+                        watched.add(int(series_id.text))
+
+            anime.clear()
+            while anime.getprevious() is not None:
+                del anime.getparent()[0]
+
+        try:
+            with open(cache_path, "wb") as f:
+                pickle.dump({"sig": sig, "ids": watched}, f)
+        except OSError:
+            pass
 
         return watched
     except Exception as e:
@@ -45,9 +89,103 @@ class AnimeDB:
         self.conn = sqlite3.connect(db_path)
         self.conn.row_factory = sqlite3.Row
         self.cur = self.conn.cursor()
-        self.watched_ids = load_mal_watched(MAL_EXPORT_PATH)
 
-    def get_anime_by_year(self, year: int) -> List[Dict]:
+        # The whole database fits in memory; map it and enlarge the page
+        # cache so repeated queries read pages instead of issuing preads
+        self.conn.execute("PRAGMA mmap_size=268435456")     # 256 MB
+        self.conn.execute("PRAGMA cache_size=-65536")       # 64 MB
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+
+        # Make sure databases built before the indexes existed get them too,
+        # so year + rating queries can scan the index instead of sorting
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_anime_year_rating ON anime (year, rating DESC)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_anime_title ON anime (title)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_anime_type ON anime (type)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_anime_favourites ON anime (favourites)")
+
+        # Precomputed total duration so longest/shortest sorts use an index
+        # instead of multiplying per row; ALTER can only add VIRTUAL columns
+        has_total = any(
+            col[1] == "total_duration"
+            for col in self.cur.execute("PRAGMA table_xinfo(anime)").fetchall()
+        )
+        if not has_total:
+            self.conn.execute("""
+                ALTER TABLE anime ADD COLUMN total_duration INTEGER GENERATED ALWAYS AS
+                    (COALESCE(cant_episodes, 0) * COALESCE(duration_per_episode, 0)) VIRTUAL
+            """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_anime_total_duration ON anime (year, total_duration)")
+
+        # Full-text title index; build it once for databases created before it existed
+        fts_exists = self.cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='anime_fts'"
+        ).fetchone()
+        if not fts_exists:
+            self.conn.execute("""
+                CREATE VIRTUAL TABLE anime_fts USING fts5(
+                    title, content='anime', content_rowid='mal_id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            self.conn.execute("INSERT INTO anime_fts(anime_fts) VALUES ('rebuild')")
+
+        # Normalized genre table; backfill it from the comma-joined genre
+        # column for databases built before the fetch script created it
+        ag_exists = self.cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='anime_genre'"
+        ).fetchone()
+        if not ag_exists:
+            self.conn.execute("""
+                CREATE TABLE anime_genre (
+                    mal_id INTEGER,
+                    genre TEXT,
+                    PRIMARY KEY (mal_id, genre)
+                )
+            """)
+            genre_rows = []
+            for mal_id, genre in self.cur.execute(
+                "SELECT mal_id, genre FROM anime WHERE genre IS NOT NULL"
+            ).fetchall():
+                genre_rows.extend((mal_id, g.strip()) for g in genre.split(",") if g.strip())
+            self.conn.executemany("INSERT OR IGNORE INTO anime_genre VALUES (?, ?)", genre_rows)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ag_genre ON anime_genre (genre)")
+
+        # Same treatment for studios
+        as_exists = self.cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='anime_studio'"
+        ).fetchone()
+        if not as_exists:
+            self.conn.execute("""
+                CREATE TABLE anime_studio (
+                    mal_id INTEGER,
+                    studio TEXT,
+                    PRIMARY KEY (mal_id, studio)
+                )
+            """)
+            studio_rows = []
+            for mal_id, studio in self.cur.execute(
+                "SELECT mal_id, studio FROM anime WHERE studio IS NOT NULL"
+            ).fetchall():
+                studio_rows.extend((mal_id, s.strip()) for s in studio.split(",") if s.strip())
+            self.conn.executemany("INSERT OR IGNORE INTO anime_studio VALUES (?, ?)", studio_rows)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_as_studio ON anime_studio (studio)")
+        self.conn.commit()
+
+    @functools.cached_property
+    def watched_ids(self) -> set:
+        """Watched ids from the MAL export, loaded on first use"""
+        watched = load_mal_watched(MAL_EXPORT_PATH)
+
+        # Keep watched ids in a temp table so queries can anti-join against it
+        # instead of binding thousands of IN (?,?,...) params per call
+        self.conn.execute("CREATE TEMP TABLE watched (mal_id INTEGER PRIMARY KEY)")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO watched VALUES (?)",
+            [(i,) for i in watched]
+        )
+        return watched
+
+    def get_anime_by_year(self, year: int) -> List[sqlite3.Row]:
         """Get all anime for a specific year"""
         self.cur.execute("""
             SELECT mal_id, title, rating, type, genre, duration_per_episode
@@ -55,13 +193,17 @@ class AnimeDB:
             WHERE year = ?
             ORDER BY rating DESC
         """, (year,))
-        return [dict(row) for row in self.cur.fetchall()]
+        return self.cur.fetchall()
 
     def get_year_progress(self) -> List[Dict]:
         """Get progress statistics for all years"""
+        self.watched_ids    # lazily builds the watched temp table
+
+        # One aggregate over the whole table instead of a query per year
         self.cur.execute("""
-            SELECT year, COUNT(*) as total
+            SELECT year, COUNT(*) as total, COUNT(w.mal_id) as watched
             FROM anime
+            LEFT JOIN watched w USING (mal_id)
             WHERE year IS NOT NULL
             GROUP BY year
             HAVING total > 0
@@ -70,94 +212,105 @@ class AnimeDB:
 
         progress_data = []
         for row in self.cur.fetchall():
-            year = row['year']
             total = row['total']
-            year_list = self.get_anime_by_year(year)
-
-            watched = len([a for a in year_list if a['mal_id'] in self.watched_ids])
-            remaining = len([a for a in year_list if a['mal_id'] not in self.watched_ids])
-            percent = (watched / total * 100) if total > 0 else 0
+            watched = row['watched']
 
             progress_data.append({
-                'year': year,
+                'year': row['year'],
                 'watched': watched,
                 'total': total,
-                'remaining': remaining,
-                'percent': percent
+                'remaining': total - watched,
+                'percent': (watched / total * 100) if total > 0 else 0
             })
 
         return progress_data
 
-    def search_remaining(self, year: int, filters: Optional[Dict] = None) -> List[Dict]:
-        """Get remaining anime for a year with optional filters"""
-        query = """
-            SELECT * FROM anime 
-            WHERE year = ? AND mal_id NOT IN ({})
-        """.format(','.join(['?'] * len(self.watched_ids)))
-
-        params = [year] + list(self.watched_ids)
+    def _filter_sql(self, filters: Optional[Dict]):
+        """Translate the CLI filter dict into WHERE conditions, ORDER BY parts and params"""
+        filter_conditions = []
+        order_clause = []
+        params = []
 
-        # Add filters if provided
         if filters:
-            filter_conditions = []
-            order_clause = []
             for key, value in filters.items():
-                if key == 'genre' and value:
-                    filter_conditions.append("genre LIKE ?")
-                    params.append(f'%{value}%')
-                elif key == 'type' and value:
+                if not value:
+                    continue
+                if key == 'type':
+                    # One type or a list of them
                     if isinstance(value, list):
-                        # Multiple types
                         placeholders = ','.join(['?'] * len(value))
                         filter_conditions.append(f"type IN ({placeholders})")
-                        params.extend(value)  
+                        params.extend(value)
                     else:
-                        # One type
                         filter_conditions.append("type = ?")
                         params.append(value)
-                elif key == 'duration_min' and value:
-                    filter_conditions.append("duration_per_episode >= ?")
-                    params.append(value)
-                elif key == 'duration_max' and value:
-                    filter_conditions.append("duration_per_episode <= ?")
-                    params.append(value)
-                elif key == 'rating_min' and value:
-                    filter_conditions.append("rating >= ?")
-                    params.append(value)
-                elif key == 'demographic' and value:
-                    filter_conditions.append("demographic = ?")
-                    params.append(value)
-                elif key == 'source' and value:
-                    filter_conditions.append("source = ?")
-                    params.append(value)
-                elif key == 'studio' and value:
-                    filter_conditions.append("studio LIKE ?")
-                    params.append(f"%{value}%")
-                    # Not filters, ORDER BY
-                elif key == 'most_popular' and value:
-                    order_clause.append("favourites DESC") 
-                elif key == 'least_popular' and value:
-                    order_clause.append("favourites ASC")
-                elif key == 'most_episodes' and value:
-                    order_clause.append("cant_episodes DESC")
-                elif key == 'least_episodes' and value:
-                    order_clause.append("cant_episodes ASC")
-                elif key == 'longest' and value:
-                    order_clause.append("COALESCE(cant_episodes, 0) * COALESCE(duration_per_episode, 0) DESC")
-                elif key == 'shortest' and value:
-                    order_clause.append("COALESCE(cant_episodes, 0) * COALESCE(duration_per_episode, 0) ASC")
-
-
-
-            if filter_conditions:
-                query += " AND " + " AND ".join(filter_conditions)
-            if order_clause:
-                query += " ORDER BY " + ", ".join(order_clause)
-            else:
-                query += " ORDER BY rating DESC"
+                elif key in _FILTERS:
+                    condition, transform = _FILTERS[key]
+                    filter_conditions.append(condition)
+                    params.append(transform(value))
+                elif key in _ORDERS:
+                    order_clause.append(_ORDERS[key])
+
+        return filter_conditions, order_clause, params
 
+    def search_remaining(self, year: int, filters: Optional[Dict] = None,
+                         limit: Optional[int] = None) -> List[sqlite3.Row]:
+        """Get remaining anime for a year with optional filters"""
+        self.watched_ids    # lazily builds the watched temp table
+
+        query = """
+            SELECT * FROM anime
+            WHERE year = ? AND mal_id NOT IN (SELECT mal_id FROM watched)
+        """
+        filter_conditions, order_clause, filter_params = self._filter_sql(filters)
+        params = [year] + filter_params
+
+        if filter_conditions:
+            query += " AND " + " AND ".join(filter_conditions)
+        if order_clause:
+            query += " ORDER BY " + ", ".join(order_clause)
+        else:
+            query += " ORDER BY rating DESC"
+        # Only materialize the rows the caller is going to show
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        # sqlite3.Row already supports key access, no need for per-row dicts
         self.cur.execute(query, params)
-        return [dict(row) for row in self.cur.fetchall()]
+        return self.cur.fetchall()
+
+    def count_remaining(self, year: int, filters: Optional[Dict] = None) -> int:
+        """Count the remaining anime for a year with the same filters"""
+        self.watched_ids    # lazily builds the watched temp table
+
+        query = """
+            SELECT COUNT(*) FROM anime
+            WHERE year = ? AND mal_id NOT IN (SELECT mal_id FROM watched)
+        """
+        filter_conditions, _, filter_params = self._filter_sql(filters)
+        params = [year] + filter_params
+
+        if filter_conditions:
+            query += " AND " + " AND ".join(filter_conditions)
+
+        return self.cur.execute(query, params).fetchone()[0]
+
+    def top_genres(self, year: int, limit: int = 10) -> List:
+        """Most common genres among the remaining anime of a year"""
+        self.watched_ids    # lazily builds the watched temp table
+
+        self.cur.execute("""
+            SELECT anime_genre.genre as genre, COUNT(*) as c
+            FROM anime_genre
+            JOIN anime USING (mal_id)
+            LEFT JOIN watched USING (mal_id)
+            WHERE anime.year = ? AND watched.mal_id IS NULL
+            GROUP BY anime_genre.genre
+            ORDER BY c DESC
+            LIMIT ?
+        """, (year, limit))
+        return self.cur.fetchall()
 
     def close(self):
         self.conn.close()
@@ -265,7 +418,8 @@ def year(
         filters['shortest'] = True
 
 
-    remaining = db.search_remaining(year, filters)
+    remaining = db.search_remaining(year, filters, limit=limit)
+    total_found = db.count_remaining(year, filters)
 
     if not remaining:
         console.print(f"[yellow]No remaining anime found for {year} with the given filters[/yellow]")
@@ -280,7 +434,7 @@ def year(
             console.print(f"[yellow]Warning: limit of 3 options in --show: {', '.join(extra_fields)}[/yellow]")
 
     console.print(f"\n[bold cyan]Remaining Anime for {year}[/bold cyan]")
-    console.print(f"[white]Found {len(remaining)} anime[/white]\n")
+    console.print(f"[white]Found {total_found} anime[/white]\n")
     # Create table
     table = Table(box=box.ROUNDED)
     table.add_column("#", style="dim", width=4)
@@ -301,35 +455,35 @@ def year(
         table.add_column("Synopsis", width=60)
 
 
-    for i, anime in enumerate(remaining[:limit], 1):
+    for i, anime in enumerate(remaining, 1):
         # Truncate long titles
         title = anime['title'][:37] + "..." if len(anime['title']) > 40 else anime['title']
 
         row = [
             str(i),
             title,
-            anime.get("type", "N/A"),
-            str(anime.get("rating", "N/A")),
-            str(anime.get("cant_episodes", "N/A")),
-            f"{anime.get('duration_per_episode', 'N/A')} min"
+            anime["type"] or "N/A",
+            str(anime["rating"] or "N/A"),
+            str(anime["cant_episodes"] or "N/A"),
+            f"{anime['duration_per_episode'] or 'N/A'} min"
         ]
         if "source" in extra_fields:
-            row.append(anime.get("source", "N/A"))
-       
+            row.append(anime["source"] or "N/A")
+
         if "season" in extra_fields:
-            row.append(anime.get("season", "N/A"))
+            row.append(anime["season"] or "N/A")
 
         if "demographic" in extra_fields:
-            row.append(anime.get("demographic", "N/A"))
+            row.append(anime["demographic"] or "N/A")
 
         if "genre" in extra_fields:
-            genre = anime.get("genre", "N/A")
+            genre = anime["genre"] or "N/A"
             if genre != "N/A" and len(genre) > 30:
                 genre= genre[:27] + "..."
             row.append(genre)
 
         if "synopsis" in extra_fields:
-            synopsis = anime.get("description") or "N/A"
+            synopsis = anime["description"] or "N/A"
             if len(synopsis) > 57:
                 synopsis = synopsis[:57] + "..."
             row.append(synopsis)
@@ -338,22 +492,14 @@ def year(
         table.add_row(*row)
     console.print(table)
 
-    if len(remaining) > limit:
-        console.print(f"\n[yellow]Showing {limit} of {len(remaining)} results. Use --limit to show more.[/yellow]")
+    if total_found > limit:
+        console.print(f"\n[yellow]Showing {limit} of {total_found} results. Use --limit to show more.[/yellow]")
 
-    # Show available genres for this year
+    # Show available genres for this year, counted in SQL
     if not filters.get('genre'):
         console.print(f"\n[bold]Popular Genres in {year}:[/bold]")
-        genre_counts = {}
-        for anime in remaining:
-            if anime.get('genre'):
-                genres = [g.strip() for g in anime['genre'].split(',')]
-                for genres in genres:
-                    genre_counts[genre] = genre_counts.get(genres, 0) + 1
-
-        # Show top 10 genres
-        top_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        genre_str = ", ".join([f"{g[0]} ({g[1]})" for g in top_genres])
+        top_genres = db.top_genres(year)
+        genre_str = ", ".join([f"{g['genre']} ({g['c']})" for g in top_genres])
         console.print(genre_str)
     
     db.close()
@@ -368,10 +514,13 @@ def search(
     db = AnimeDB(DB_PATH)
     
     sql_query = """
-        SELECT * FROM anime 
-        WHERE title LIKE ? 
+        SELECT anime.* FROM anime_fts
+        JOIN anime ON anime.mal_id = anime_fts.rowid
+        WHERE anime_fts MATCH ?
     """
-    params = [f'%{query}%']
+    # Quote the term so FTS operators in user input are taken literally,
+    # with * for prefix matching on the last word
+    params = ['"{}"*'.format(query.replace('"', '""'))]
     
     if year:
         sql_query += " AND year = ?"
@@ -381,7 +530,7 @@ def search(
     params.append(limit)
     
     db.cur.execute(sql_query, params)
-    results = [dict(row) for row in db.cur.fetchall()]
+    results = db.cur.fetchall()
     
     if not results:
         console.print(f"[yellow]No anime found matching '{query}'[/yellow]")
@@ -404,9 +553,9 @@ def search(
         
         table.add_row(
             title,
-            str(anime.get('year', 'N/A')),
-            anime.get('type', 'N/A'),
-            str(anime.get('rating', 'N/A')),
+            str(anime['year'] or 'N/A'),
+            anime['type'] or 'N/A',
+            str(anime['rating'] or 'N/A'),
             f"[{status_style}]{status}[/{status_style}]"
         )
     
@@ -422,9 +571,8 @@ def stats():
     db.cur.execute("SELECT COUNT(*) as total FROM anime")
     total_anime = db.cur.fetchone()['total']
     
-    db.cur.execute("SELECT COUNT(*) as watched FROM anime WHERE mal_id IN ({})".format(
-        ','.join(['?'] * len(db.watched_ids))
-    ), list(db.watched_ids))
+    db.watched_ids      # lazily builds the watched temp table
+    db.cur.execute("SELECT COUNT(*) as watched FROM anime WHERE mal_id IN (SELECT mal_id FROM watched)")
     watched = db.cur.fetchone()['watched']
     
     percent = (watched / total_anime * 100) if total_anime > 0 else 0
@@ -1,35 +1,52 @@
 import sqlite3
 import requests
+import threading
 import time
-
-ANILIST_URL = "https://graphql.anilist.co"
-QUERY = """
-query ($startDate: FuzzyDateInt, $endDate: FuzzyDateInt, $page: Int) {
-  Page(page: $page, perPage: 50) {
-    media(type: ANIME, startDate_greater: $startDate, startDate_lesser: $endDate) {
-      idMal
-      title { romaji english native }
-      startDate { year month day }
-      season
-      seasonYear
-      averageScore
-      favourites
-      episodes
-      duration
-      format
-      genres
-      source
-      studios(isMain: true) { nodes { name } }
-      description(asHtml: false)
-      coverImage { large }
-      tags { name category }
-    }
-    pageInfo { hasNextPage }
-  }
-}
-"""
-
-conn = sqlite3.connect("anime.db")
+from concurrent.futures import ThreadPoolExecutor
+
+from anilist import extract_row, iter_year
+
+MAX_WORKERS = 8
+REQUESTS_PER_MINUTE = 80    # AniList allows 90/min, keep a safety margin
+
+# Shared session keeps the connection to AniList alive between requests
+session = requests.Session()
+
+_local = threading.local()
+
+def get_conn():
+    # One connection per worker thread; WAL lets them commit concurrently
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect("anime.db")
+        # Cut fsync/IO cost: WAL journaling, relaxed sync, temp data in memory
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        _local.conn = conn
+    return conn
+
+
+class RateLimiter:
+    """Spaces requests out so all workers together stay under the API limit"""
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.next_slot < now:
+                self.next_slot = now
+            delay = self.next_slot - now
+            self.next_slot += self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE)
+
+conn = get_conn()
 cur = conn.cursor()
 cur.execute("""
 CREATE TABLE IF NOT EXISTS anime (
@@ -47,98 +64,105 @@ CREATE TABLE IF NOT EXISTS anime (
     studio TEXT,
     favourites INTEGER,
     description TEXT,
-    cover_url TEXT
+    cover_url TEXT,
+    total_duration INTEGER GENERATED ALWAYS AS
+        (COALESCE(cant_episodes, 0) * COALESCE(duration_per_episode, 0)) STORED
 )
 """)
-conn.commit()
+cur.execute("CREATE INDEX IF NOT EXISTS idx_anime_year_rating ON anime (year, rating DESC)")
+cur.execute("CREATE INDEX IF NOT EXISTS idx_anime_title ON anime (title)")
+cur.execute("CREATE INDEX IF NOT EXISTS idx_anime_type ON anime (type)")
+cur.execute("CREATE INDEX IF NOT EXISTS idx_anime_favourites ON anime (favourites)")
+cur.execute("CREATE INDEX IF NOT EXISTS idx_anime_total_duration ON anime (year, total_duration)")
+cur.execute("""
+CREATE TABLE IF NOT EXISTS anime_genre (
+    mal_id INTEGER,
+    genre TEXT,
+    PRIMARY KEY (mal_id, genre)
+)
+""")
+cur.execute("CREATE INDEX IF NOT EXISTS idx_ag_genre ON anime_genre (genre)")
+cur.execute("""
+CREATE TABLE IF NOT EXISTS anime_studio (
+    mal_id INTEGER,
+    studio TEXT,
+    PRIMARY KEY (mal_id, studio)
+)
+""")
+cur.execute("CREATE INDEX IF NOT EXISTS idx_as_studio ON anime_studio (studio)")
 
-def insert(row):
+# Full-text index over titles, kept in sync with the anime table by triggers
+fts_exists = cur.execute(
+    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='anime_fts'"
+).fetchone()
+if not fts_exists:
     cur.execute("""
+    CREATE VIRTUAL TABLE anime_fts USING fts5(
+        title, content='anime', content_rowid='mal_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """)
+    # Index any rows inserted before the FTS table existed
+    cur.execute("INSERT INTO anime_fts(anime_fts) VALUES ('rebuild')")
+cur.execute("""
+CREATE TRIGGER IF NOT EXISTS anime_fts_ai AFTER INSERT ON anime BEGIN
+    INSERT INTO anime_fts(rowid, title) VALUES (new.mal_id, new.title);
+END
+""")
+cur.execute("""
+CREATE TRIGGER IF NOT EXISTS anime_fts_ad AFTER DELETE ON anime BEGIN
+    INSERT INTO anime_fts(anime_fts, rowid, title) VALUES ('delete', old.mal_id, old.title);
+END
+""")
+cur.execute("""
+CREATE TRIGGER IF NOT EXISTS anime_fts_au AFTER UPDATE OF title ON anime BEGIN
+    INSERT INTO anime_fts(anime_fts, rowid, title) VALUES ('delete', old.mal_id, old.title);
+    INSERT INTO anime_fts(rowid, title) VALUES (new.mal_id, new.title);
+END
+""")
+conn.commit()
+
+def insert_batch(rows, genre_rows, studio_rows):
+    # One transaction per page instead of one fsync per row
+    conn = get_conn()
+    conn.executemany("""
         INSERT OR IGNORE INTO anime
         (mal_id, title, year, rating, cant_episodes, duration_per_episode,
          type, genre, demographic, season, source, studio, favourites, description, cover_url)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, row)
+    """, rows)
+    conn.executemany("INSERT OR IGNORE INTO anime_genre VALUES (?, ?)", genre_rows)
+    conn.executemany("INSERT OR IGNORE INTO anime_studio VALUES (?, ?)", studio_rows)
     conn.commit()
 
 
 def fetch_year(year):
-    page = 1
     count = 0
-    wait_time = 1
-    start_date = year * 10000 + 101     # YYYY0101 -> Year jan 1 
-    end_date = year * 10000 + 1231      # YYYY1231 -> Year dec 31
-
-    while True:
-        try:
-
-            r = requests.post(ANILIST_URL, json={"query": QUERY, "variables": {"startDate": start_date, "endDate": end_date, "page": page}})
-            r.raise_for_status()
-            resp_json = r.json()
-        except (requests.exceptions.RequestException, ValueError):
-            time.sleep(5)
-            continue
-
-        # Handle AniList errors or missing data
-        if "errors" in resp_json:
-            err = resp_json["errors"][0]
-            if err.get("status") == 429:
-                time.sleep(wait_time)
-                wait_time = min(wait_time * 2, 20)
+
+    for media in iter_year(year, session, rate_limiter):
+        batch = []
+        genre_batch = []
+        studio_batch = []
+        for m in media:
+            extracted = extract_row(m, year)
+            if extracted is None:
                 continue
-            else:
-                print(f"[AniList ERROR] year={year} page={page}: {resp_json['errors']}")
-                break
-
-        wait_time = 1  # reset wait time on success
-        data = resp_json.get("data", {}).get("Page")
-        if not data:
-            print(f"[No data] year={year} page={page}")
-            break
-
-        for m in data.get("media", []):
-            genres_list = m.get("genres") or []
-            if "Hentai" in genres_list:
-                continue  # skip Hentai
-
-            mal_id = m["idMal"]
-            title = m["title"].get("english") or m["title"].get("romaji") or m["title"].get("native")
-            score = m.get("averageScore")
-            episodes = m.get("episodes")
-            duration = m.get("duration")
-            fmt = m.get("format")
-            genres = ", ".join(genres_list)
-            season = m.get("season")
-            source = m.get("source")
-            studio = ", ".join([s["name"] for s in m.get("studios", {}).get("nodes", [])])
-            favourites = m.get("favourites")
-            description = m.get("description")
-            cover_url = m.get("coverImage", {}).get("large")
-
-            # demographic guess
-            demo = None
-            for t in m.get("tags", []):
-                n = t.get("name", "").lower()
-                if n in ("shounen", "shoujo", "seinen", "josei"):
-                    demo = t["name"]
-                    break
-
-            row = (
-                mal_id, title, year, score, episodes, duration, fmt,
-                genres, demo, season, source, studio, favourites, description, cover_url
-            )
-            insert(row)
-            count += 1
+            row, genres_list, studio_list = extracted
+            mal_id = row[0]
 
-        if not data.get("pageInfo", {}).get("hasNextPage"):
-            break
+            batch.append(row)
+            genre_batch.extend((mal_id, g) for g in genres_list)
+            studio_batch.extend((mal_id, s) for s in studio_list)
+            count += 1
 
-        page += 1
-        time.sleep(0.25)
+        if batch:
+            insert_batch(batch, genre_batch, studio_batch)
 
     print(f"{year} → {count} saved ")
 
 
 if __name__ == "__main__":
-    for y in range(1940, 2026): # 1940 to 2025
-        fetch_year(y)
+    # Fetch years in parallel; the rate limiter keeps the combined request
+    # rate under the AniList ceiling
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        list(pool.map(fetch_year, range(1940, 2026)))   # 1940 to 2025
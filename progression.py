@@ -1,28 +1,28 @@
-import xml.etree.ElementTree as ET 
+from lxml import etree as ET
 import sqlite3
 
 MAL_EXPORT_PATH = "data/animelist-1-12-25.xml"
 DB_PATH = "anime.db"
-def load_mal_watched(path):
-    tree = ET.parse(path)
-    root = tree.getroot()
 
+# Common casings included up front so the hot loop skips the lower() call
+_COMPLETED = frozenset({"completed", "Completed", "COMPLETED", "2"})
+def load_mal_watched(path):
     watched = set()
 
-    for anime in root.findall("anime"):
+    # Stream the export instead of building the whole tree in memory,
+    # lxml filters the <anime> end events in C
+    for event, anime in ET.iterparse(path, events=("end",), tag="anime"):
         series_id = anime.find("series_animedb_id")
-        if series_id is None or series_id.text is None:
-            continue
-        mal_id = int(series_id.text)
-
-        status = anime.find("my_status")
-        if status is None or status.text is None:
-            status = ""
-        else: 
-            status = status.text.strip()
-
-        if status.lower() == "completed" or status == "2":
-            watched.add(mal_id)
+        if series_id is not None and series_id.text is not None:
+            status = anime.find("my_status")
+            if status is not None and status.text is not None:
+                s = status.text.strip()
+                if s in _COMPLETED or s.lower() == "completed":
+                    watched.add(int(series_id.text))
+
+        anime.clear()
+        while anime.getprevious() is not None:
+            del anime.getparent()[0]
 
     return watched
 